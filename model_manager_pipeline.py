@@ -1,35 +1,198 @@
+import os
+# Expandable segments curb allocator fragmentation without capping memory; must be
+# set before torch initializes CUDA
+os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True")
 from unsloth import FastVisionModel
 import torch
-from transformers import pipeline, AutoProcessor, AutoModelForImageTextToText
+from transformers import (pipeline, AutoConfig, AutoProcessor, AutoModelForImageTextToText, BitsAndBytesConfig,
+                          DynamicCache, TextIteratorStreamer)
+from accelerate import init_empty_weights
+from accelerate.utils import set_module_tensor_to_device
+from safetensors import safe_open
 from torch.optim.lr_scheduler import LRScheduler
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from PIL import Image
-from io import BytesIO
 import json
+import copy
+import functools
+import gc
+import hashlib
 import io
 import base64
+import logging
 from typing import Dict, List, Optional
 import time
-import os
+import re
+import subprocess
+import threading
 import cv2
+import numpy as np
+import psutil
+import jinja2.ext
+from jinja2.sandbox import ImmutableSandboxedEnvironment
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from contextlib import ExitStack
 from prompts import MEDICAL_TRIAGE_PROMPT
 
+logger = logging.getLogger(__name__)
+
 # Unsloth disabled for Jetson compatibility
 UNSLOTH_AVAILABLE = False
 print("🔄 Using standard transformers approach (Unsloth disabled for Jetson)")
 
+# Per-request debug logging (message summaries, GPU timing); enable with RAPIDCARE_DEBUG=1
+DEBUG = os.getenv("RAPIDCARE_DEBUG", "0") == "1"
+
+# Prompt prefixes (text before the first image/audio) whose KV cache is shared
+# across requests, and the shortest prefix worth caching
+MAX_PREFIX_CACHES = 4
+PREFIX_CACHE_MIN_TOKENS = 64
+
+# Prompt lengths are padded to a multiple of this when CUDA graphs are in use
+PAD_BUCKET = 64
+
+# Static KV cache lengths (prompt + new tokens) are rounded up to a multiple of this
+STATIC_CACHE_BUCKET = 256
+
+# Prompts longer than this are prefilled in slices of this many tokens
+PREFILL_CHUNK = 512
+
+# Share of the usable VRAM / free RAM that offload=True plans for weights (the rest is
+# left for activations, the KV cache and the OS), and the spill directory
+OFFLOAD_WEIGHT_SHARE = 0.75
+OFFLOAD_FOLDER = "./offload"
+
+# Sampled video frames at least this far apart are seeked to in parallel
+# instead of decoding every frame in between
+SEEK_MIN_GAP = 120
+
+# Checkpoint tensor names belonging to one repeated block (e.g. "...layers.12.mlp...")
+LAYER_PREFIX = re.compile(r"^(.*\.layers\.\d+)\.")
+
+# Generation cap for the fixed-format triage report (decoding stops earlier at <end_of_turn>)
+TRIAGE_MAX_NEW_TOKENS = 256
+
+# Audio longer than this is transcribed in windows of this many seconds
+AUDIO_CHUNK_SECONDS = 30
+
+# Multiplier for byte counts reported in GB
+_BYTES_TO_GIB = 1.0 / (1024 ** 3)
+
+# FlashAttention-2 kernels (optional, CUDA only)
+try:
+    import flash_attn
+    FLASH_ATTN_AVAILABLE = True
+except ImportError:
+    FLASH_ATTN_AVAILABLE = False
+
+# AWQ int4 GEMM kernels for prequantized checkpoints (optional, CUDA only)
+try:
+    import awq
+    AWQ_AVAILABLE = True
+except ImportError:
+    AWQ_AVAILABLE = False
+
+# HQQ backend for 4-bit quantized KV caches (optional)
+try:
+    import hqq
+    HQQ_AVAILABLE = True
+except ImportError:
+    HQQ_AVAILABLE = False
+
+# Concurrent safetensors streaming for faster cold starts (optional)
+try:
+    from runai_model_streamer import SafetensorsStreamer
+    RUNAI_STREAMER_AVAILABLE = True
+except ImportError:
+    RUNAI_STREAMER_AVAILABLE = False
+
+# Audio decoding/resampling for splitting long clips (librosa-backed, optional)
+try:
+    from transformers.audio_utils import load_audio
+    AUDIO_LOADING_AVAILABLE = True
+except ImportError:
+    AUDIO_LOADING_AVAILABLE = False
+
+def _raise_template_error(message: str):
+    """raise_exception() helper exposed to chat templates"""
+    raise jinja2.exceptions.TemplateError(message)
+
 class ModelManagerPipeline:
     """Model manager using direct model loading for all tasks"""
     
-    def __init__(self, model_path: str = "./models/gemma3n-4b", device: str = None):
+    def __init__(self, model_path: str = "./models/gemma3n-4b", device: str = None,
+                 offload_vision: bool = False, compile_model: bool = False,
+                 quantization: str = "auto", do_sample: bool = False,
+                 temperature: float = 1.0, top_k: int = 64, top_p: float = 0.95,
+                 num_beams: int = 1, offload: bool = False, compile_regional: bool = False,
+                 quantize_kv_cache: bool = False, lazy: bool = False,
+                 reserve_vram_mb: int = 0, max_memory: Optional[Dict] = None,
+                 triage_prompt_first: bool = False):
         """
         Initialize direct model manager
         
         Args:
             model_path: Path to local model or Hugging Face model name
             device: Device to run on ("cpu", "cuda:0", etc.) - auto-detects if None
+            offload_vision: Keep the vision tower on CPU and only the language model on GPU
+            compile_model: Compile the model forward with torch.compile after loading; on
+                CUDA this also switches generate() to a static KV cache, which turns off
+                prefix-cache reuse and chunked prefill for every request
+            quantization: Weight format - "auto" (bf16 on Ampere+ CUDA, fp16 on older
+                GPUs, fp32 on CPU), "bf16",
+                "nf4" (4-bit bitsandbytes, CUDA only), "awq" (prequantized int4 checkpoint
+                in <model_path>-awq, CUDA only) or "int8" (bitsandbytes LLM.int8 on CUDA,
+                dynamic int8 Linear layers on CPU)
+            do_sample: Sample responses instead of greedy decoding
+            temperature: Sampling temperature (only used with do_sample)
+            top_k: Top-k sampling cutoff (only used with do_sample)
+            top_p: Nucleus sampling cutoff (only used with do_sample)
+            num_beams: Beam count for generate(); 1 keeps single-sequence decoding
+            offload: Let accelerate spill layers that don't fit in VRAM to CPU RAM and disk
+            compile_regional: With compile_model, compile only the repeated transformer
+                blocks (much faster first compile, no CUDA graphs)
+            quantize_kv_cache: Store the KV cache in 4-bit HQQ (needs the hqq package) for
+                every request; prompts are then prefilled in one pass, without prefix-cache
+                reuse or chunked prefill
+            lazy: Defer loading the model until the first chat request
+            max_memory: accelerate max_memory for offload=True (e.g. {0: "5GiB", "cpu": "2GiB"});
+                by default sized from the free VRAM and RAM at load time
+            triage_prompt_first: Put the triage prompt before the video frames instead of
+                after them (the Colab format), so its KV cache is shared across video
+                requests; changes what the model sees, so validate triage output first.
+                This is the only way triage KV is reused, and only with a dynamic KV
+                cache: compile_model on CUDA and quantize_kv_cache turn prefix reuse off
+            reserve_vram_mb: Hold this much VRAM from model load on, so other processes
+                can't take it; it is handed to the allocator when generate() runs out of memory
         """
+        # Per-request output goes through this module's logger; handlers and the
+        # root level are left to the application's entry point
+        if DEBUG:
+            logger.setLevel(logging.DEBUG)
+        
         self.model_path = model_path
+        self.offload_vision = offload_vision
+        self.compile_model = compile_model
+        self.quantization = quantization
+        self.do_sample = do_sample
+        self.temperature = temperature
+        self.top_k = top_k
+        self.top_p = top_p
+        self.num_beams = num_beams
+        self.offload = offload
+        self.compile_regional = compile_regional
+        self.quantize_kv_cache = quantize_kv_cache
+        self.reserve_vram_mb = reserve_vram_mb
+        self.max_memory = max_memory
+        self.triage_prompt_first = triage_prompt_first
+        # Share of total VRAM the allocator may use (capped on Jetson below)
+        self._memory_fraction = 1.0
+        if quantize_kv_cache and not HQQ_AVAILABLE:
+            print("⚠️  KV cache quantization needs hqq, using an unquantized cache")
+            self.quantize_kv_cache = False
         
         # Auto-detect device for any GPU
         if device is None:
@@ -48,17 +211,68 @@ class ModelManagerPipeline:
             self.device = device
             
         print(f"🎯 Using device: {self.device}")
+        # Parsed once; the per-request paths compare and copy against these
+        self._torch_device = torch.device(self.device)
+        self._on_cuda = self._torch_device.type == "cuda"
+        
+        # Static GPU facts, queried once; get_status() only reads the live counters
+        self._gpu_static = {}
+        if torch.cuda.is_available():
+            self._gpu_static = {
+                'gpu_name': torch.cuda.get_device_name(0),
+                'gpu_memory_total': torch.cuda.get_device_properties(0).total_memory * _BYTES_TO_GIB,  # GB
+                'is_jetson': self._is_jetson_device(),
+                # The allocator reads this once, when CUDA initializes
+                'cuda_alloc_conf': os.environ.get("PYTORCH_CUDA_ALLOC_CONF", "")
+            }
+        # Fields of get_status() that never change; copied and topped up per call
+        self._status_template = {
+            'mode': 'direct',
+            'model_path': self.model_path,
+            'device': self.device,
+            **self._gpu_static
+        }
         
         # Print device capabilities
         if self.device == "cuda:0" and torch.cuda.is_available():
-            gpu_name = torch.cuda.get_device_name(0)
-            gpu_memory = torch.cuda.get_device_properties(0).total_memory / 1024**3
-            device_type = "Jetson" if self._is_jetson_device() else "Standard GPU"
+            gpu_name = self._gpu_static['gpu_name']
+            gpu_memory = self._gpu_static['gpu_memory_total']
+            device_type = "Jetson" if self._gpu_static['is_jetson'] else "Standard GPU"
             print(f"📊 GPU: {gpu_name} ({gpu_memory:.1f} GB) - {device_type}")
         
         self.direct_model = None
         self.direct_processor = None
+        self._model_dtype = None
+        self._eos_id = None
+        self._end_of_turn_id = None
+        self._triage_prompt_ids = None
+        self._dummy_pixel_values = None
+        self._chat_template = None
+        self._special_tokens = {}
+        # Rendered prompts keyed by the messages' JSON (e.g. the fixed video triage prompt)
+        self._render_chat_template_json = functools.lru_cache(maxsize=128)(
+            lambda messages_json: self._render_chat_template_uncached(json.loads(messages_json))
+        )
+        self._load_lock = threading.Lock()
+        # Serializes generate(): one model instance isn't safe under concurrent calls
+        self._inference_lock = threading.Lock()
+        # sha256 of a prompt prefix's token ids -> its KV cache, least recently used first
+        self._prefix_caches = OrderedDict()
         self._model_loaded = False
+        # Set by unload(to_ram=True): weights sit in pinned CPU memory until reloaded
+        self._parked_on_cpu = False
+        # Headroom block held by _reserve_vram() (reserve_vram_mb)
+        self._vram_reservation = None
+        
+        # Keep-alive session so repeated image URLs from one host skip the TCP/TLS handshake
+        self._http = requests.Session()
+        http_adapter = HTTPAdapter(
+            pool_connections=8,
+            pool_maxsize=32,
+            max_retries=Retry(total=2, backoff_factor=0.1)
+        )
+        self._http.mount("http://", http_adapter)
+        self._http.mount("https://", http_adapter)
         
         # GPU memory optimization for all CUDA devices
         if self.device == "cuda:0" and torch.cuda.is_available():
@@ -68,96 +282,978 @@ class ModelManagerPipeline:
             is_jetson = self._is_jetson_device()
             if is_jetson:
                 print("   🎯 Jetson device detected - using specialized optimizations")
-                # Jetson-specific memory fraction (more conservative)
-                torch.cuda.set_per_process_memory_fraction(0.8)
+                # Jetson shares its memory with the CPU, so leave headroom for the OS
+                self._memory_fraction = 0.8
+                torch.cuda.set_per_process_memory_fraction(self._memory_fraction)
             else:
+                # Discrete GPUs aren't capped: the cap starved torch.compile scratch
+                # buffers and quantized kernel workspaces
                 print("   🎯 Standard GPU device detected")
-                # Standard GPU memory fraction
-                torch.cuda.set_per_process_memory_fraction(0.9)
             
             # Enable memory efficient attention if available
             try:
                 torch.backends.cuda.enable_flash_sdp(True)
+                torch.backends.cuda.enable_mem_efficient_sdp(True)
                 print("   ✅ Flash attention enabled")
             except:
                 print("   ⚠️  Flash attention not available")
             
-            # Clear GPU cache
-            torch.cuda.empty_cache()
-            print("   ✅ GPU memory cache cleared")
+            # TF32 matmuls/convolutions on Ampere+ (ignored on older GPUs); any fp32
+            # work left in the model runs on tensor cores
+            torch.backends.cuda.matmul.allow_tf32 = True
+            torch.backends.cudnn.allow_tf32 = True
             
             # Print GPU info
-            gpu_name = torch.cuda.get_device_name(0)
-            gpu_memory = torch.cuda.get_device_properties(0).total_memory / 1024**3
+            gpu_name = self._gpu_static['gpu_name']
+            gpu_memory = self._gpu_static['gpu_memory_total']
             print(f"   📊 GPU: {gpu_name} ({gpu_memory:.1f} GB)")
             print(f"   🎯 Device type: {'Jetson' if is_jetson else 'Standard GPU'}")
         
+        if not lazy:
+            # Pay for loading (and compiling) at startup rather than in the first request
+            try:
+                self._load_direct_model()
+            except Exception as e:
+                print(f"⚠️  Model load at startup failed, retrying on first request: {e}")
+        
     def _load_direct_model(self):
-        """Load model directly using transformers (lazily on first use)"""
+        """Load model directly using transformers (at startup, or on first use when lazy)"""
         if self._model_loaded:
             return
-            
-        print("🔄 Loading Gemma 3n model directly...")
         
-        try:
-            # Use local model path
-            local_model_path = self.model_path
+        # Concurrent first requests must not each load a copy of the model
+        with self._load_lock:
+            if self._model_loaded:
+                return
+            
+            if self._parked_on_cpu:
+                # unload() kept the weights in pinned RAM; copying them back skips the disk
+                start_time = time.perf_counter()
+                self.direct_model.to(self._torch_device, non_blocking=True)
+                torch.cuda.synchronize()
+                self._parked_on_cpu = False
+                self._model_loaded = True
+                self._reserve_vram()
+                print(f"✅ Model restored to {self.device} in {time.perf_counter() - start_time:.2f} seconds")
+                return
+            
+            print("🔄 Loading Gemma 3n model directly...")
             
-            # Check if local model exists
-            if not os.path.exists(local_model_path):
-                print(f"❌ Local model not found at {local_model_path}")
-                raise FileNotFoundError(f"Local model not found at {local_model_path}")
-            
-            # Load model with FastVisionModel optimizations (if available)
-            if UNSLOTH_AVAILABLE:
-                print("🚀 Loading model with FastVisionModel optimizations...")
-                try:
-                    # Use FastVisionModel loading WITHOUT 4bit quantization to avoid dtype issues
-                    self.direct_model, self.direct_processor = FastVisionModel.from_pretrained(
-                        local_model_path,
-                        dtype=None,  # Auto detection
-                        token=None,  # No token needed for local model
-                        load_in_4bit=False,  # Disabled to avoid dtype casting issues
-                        use_gradient_checkpointing="unsloth",  # For long context
-                    )
-                    
-                    # Enable FastVisionModel for inference
-                    self.direct_model = self.direct_model.for_inference()
-                    print("✅ FastVisionModel loaded and enabled for inference!")
-                    
-                except Exception as e:
-                    print(f"⚠️  FastVisionModel loading failed: {e}")
-                    print("🔄 Falling back to standard model loading...")
+            try:
+                # Use local model path
+                local_model_path = self.model_path
+                
+                # Check if local model exists
+                if not os.path.exists(local_model_path):
+                    print(f"❌ Local model not found at {local_model_path}")
+                    raise FileNotFoundError(f"Local model not found at {local_model_path}")
+                
+                # Load model with FastVisionModel optimizations (if available)
+                if UNSLOTH_AVAILABLE:
+                    print("🚀 Loading model with FastVisionModel optimizations...")
+                    try:
+                        # Use FastVisionModel loading WITHOUT 4bit quantization to avoid dtype issues
+                        self.direct_model, self.direct_processor = FastVisionModel.from_pretrained(
+                            local_model_path,
+                            dtype=None,  # Auto detection
+                            token=None,  # No token needed for local model
+                            load_in_4bit=False,  # Disabled to avoid dtype casting issues
+                            use_gradient_checkpointing="unsloth",  # For long context
+                        )
+                        
+                        # Enable FastVisionModel for inference
+                        self.direct_model = self.direct_model.for_inference()
+                        print("✅ FastVisionModel loaded and enabled for inference!")
+                        
+                    except Exception as e:
+                        print(f"⚠️  FastVisionModel loading failed: {e}")
+                        print("🔄 Falling back to standard model loading...")
+                        self._load_standard_model(local_model_path)
+                else:
+                    print("⚠️  Unsloth not available, using standard model loading")
                     self._load_standard_model(local_model_path)
+                
+                self.direct_model.eval()
+                # Parameters and special token ids never change after loading, so look them up once
+                # (packed 4-bit weights are stored as uint8, so skip non-float ones)
+                self._model_dtype = next(
+                    param.dtype for param in self.direct_model.parameters()
+                    if param.is_floating_point()
+                )
+                tokenizer = self.direct_processor.tokenizer
+                self._eos_id = tokenizer.eos_token_id
+                self._end_of_turn_id = tokenizer.convert_tokens_to_ids('<end_of_turn>')
+                # Chat templates trim text items, so tokenize the prompt the same way
+                self._triage_prompt_ids = tokenizer(
+                    MEDICAL_TRIAGE_PROMPT.strip(),
+                    add_special_tokens=False,
+                    return_tensors="pt"
+                ).input_ids
+                
+                self._chat_template = self._compile_chat_template()
+                # special_tokens_map builds a fresh dict on every access
+                self._special_tokens = dict(tokenizer.special_tokens_map)
+                
+                # NHWC lets the vision tower's convolutions use oneDNN/Tensor Core kernels
+                vision_tower = self._get_vision_tower()
+                if vision_tower is not None:
+                    vision_tower.to(memory_format=torch.channels_last)
+                # Same for the audio frontend's subsampling convs (cuDNN NHWC kernels, CUDA only)
+                audio_tower = self._get_audio_tower()
+                if audio_tower is not None and self._on_cuda:
+                    audio_tower.to(memory_format=torch.channels_last)
+                if self.compile_model:
+                    # Compile under the same inference mode the chat methods run in,
+                    # otherwise every request re-enters the graph with autograd state
+                    with torch.inference_mode():
+                        self._compile_model()
+                
+                self._model_loaded = True
+                print("✅ Direct model loaded successfully")
+                self._reserve_vram()
+                
+            except Exception as e:
+                print(f"❌ Failed to load direct model: {e}")
+                raise
+    
+    def _load_standard_model(self, local_model_path: str):
+        """Load processor and model with standard transformers classes"""
+        self.direct_processor = AutoProcessor.from_pretrained(local_model_path, trust_remote_code=True)
+        
+        if self.quantization == "int8" and self.device == "cpu":
+            self._load_layered_int8(local_model_path)
+            return
+        
+        offload_kwargs = {}
+        if self.device.startswith("cuda"):
+            # bf16 keeps fp32's exponent range (no fp16 overflow to inf/NaN in
+            # softmax) at the same bytes, but needs Ampere or newer (incl. Jetson Orin)
+            if torch.cuda.get_device_capability(self.device)[0] >= 8:
+                torch_dtype = torch.bfloat16
+            else:
+                torch_dtype = torch.float16
+            if self.offload:
+                # accelerate fills the GPU budget first, then CPU RAM, then disk
+                max_memory = self._offload_max_memory()
+                print(f"   🎯 Offloading enabled (max memory {max_memory})")
+                device_map = "auto"
+                offload_kwargs = {
+                    "max_memory": max_memory,
+                    "offload_folder": OFFLOAD_FOLDER,
+                    "offload_state_dict": True,
+                }
+            else:
+                device_map = self._get_device_map()
+        else:
+            torch_dtype = torch.float32
+            device_map = self.device
+        
+        weights_path = local_model_path
+        quantization_config = None
+        nf4_save_path = None
+        if self.quantization == "bf16":
+            torch_dtype = torch.bfloat16
+        elif self.quantization == "nf4":
+            if self.device.startswith("cuda"):
+                # 4-bit weights halve the bytes streamed per decode step again vs bf16
+                torch_dtype = torch.bfloat16
+                nf4_path = f"{os.path.normpath(local_model_path)}-nf4"
+                if os.path.exists(os.path.join(nf4_path, "config.json")):
+                    # Saved by an earlier run; its config carries the bnb settings,
+                    # so the fp16 checkpoint is neither read nor re-quantized
+                    print(f"🚀 Loading prequantized NF4 weights from {nf4_path}")
+                    weights_path = nf4_path
+                else:
+                    quantization_config = BitsAndBytesConfig(
+                        load_in_4bit=True,
+                        bnb_4bit_quant_type="nf4",
+                        bnb_4bit_use_double_quant=True,
+                        bnb_4bit_compute_dtype=torch.bfloat16
+                    )
+                    nf4_save_path = nf4_path
+            else:
+                print("⚠️  NF4 quantization needs CUDA, loading unquantized weights")
+        elif self.quantization == "int8":
+            # CPU never gets here (dynamic int8 path above); on CUDA, bitsandbytes keeps
+            # int8 weights with fp16 outlier columns, half the bytes of bf16
+            quantization_config = BitsAndBytesConfig(
+                load_in_8bit=True,
+                # Modules the device map puts on CPU stay unquantized fp32
+                llm_int8_enable_fp32_cpu_offload=self.offload or self.offload_vision
+            )
+        elif self.quantization == "awq":
+            # Packed W4A16 weights are unpacked inside the GEMM kernel, unlike NF4's
+            # dequantize-to-bf16 step, so decode streams ~4x fewer bytes than fp16
+            awq_path = f"{os.path.normpath(local_model_path)}-awq"
+            if not self.device.startswith("cuda") or not AWQ_AVAILABLE:
+                print("⚠️  AWQ needs CUDA and autoawq, loading unquantized weights")
+            elif not os.path.exists(os.path.join(awq_path, "config.json")):
+                print(f"⚠️  No AWQ checkpoint at {awq_path}, loading unquantized weights")
+            else:
+                # The checkpoint's config carries the AWQ settings
+                print(f"🚀 Loading AWQ int4 weights from {awq_path}")
+                weights_path = awq_path
+        
+        self.direct_model = AutoModelForImageTextToText.from_pretrained(
+            weights_path,
+            # Streaming only applies to the original checkpoint loaded as-is: it holds
+            # the whole unquantized state dict at once, which bitsandbytes (quantizing
+            # on load) and accelerate's offloading exist to avoid
+            state_dict=(self._stream_state_dict(local_model_path, device_map)
+                        if weights_path == local_model_path and quantization_config is None
+                        and not self.offload else None),
+            torch_dtype=torch_dtype,
+            quantization_config=quantization_config,
+            device_map=device_map,
+            attn_implementation=self._get_attn_implementation(),
+            low_cpu_mem_usage=True,
+            trust_remote_code=True,
+            **offload_kwargs
+        )
+        print(f"✅ Model loaded with {torch_dtype} on {device_map}"
+              + (f" ({self.quantization.upper()} weights)"
+                 if quantization_config or weights_path != local_model_path else ""))
+        
+        if nf4_save_path:
+            try:
+                self.direct_model.save_pretrained(nf4_save_path, safe_serialization=True)
+                print(f"💾 Saved NF4 weights to {nf4_save_path} for faster restarts")
+            except Exception as e:
+                print(f"⚠️  Could not save NF4 weights: {e}")
+    
+    def _load_layered_int8(self, local_model_path: str):
+        """
+        Load the model one layer at a time, quantizing each layer's Linear
+        modules to dynamic INT8 before the next layer is read, so the repeated
+        layer stacks are never all held in fp32 at once
+        
+        Tensors outside the layer stacks (embedding tables, vision/audio towers,
+        norms) are materialized in fp32 up front and stay resident, so peak RAM
+        is their fp32 size plus the INT8 layers, not the INT8 footprint alone.
+        """
+        print("🔧 Loading model layer by layer with dynamic INT8 quantization...")
+        # oneDNN routes the int8 GEMMs through VNNI kernels on x86
+        if "onednn" in torch.backends.quantized.supported_engines:
+            torch.backends.quantized.engine = "onednn"
+        
+        config = AutoConfig.from_pretrained(local_model_path, trust_remote_code=True)
+        with init_empty_weights():
+            model = AutoModelForImageTextToText.from_config(
+                config,
+                torch_dtype=torch.float32,
+                attn_implementation=self._get_attn_implementation(),
+                trust_remote_code=True
+            )
+        expected_names = set(model.state_dict().keys())
+        
+        shard_files = sorted(
+            os.path.join(local_model_path, name)
+            for name in os.listdir(local_model_path)
+            if name.endswith(".safetensors")
+        )
+        if not shard_files:
+            raise FileNotFoundError(f"No safetensors shards found in {local_model_path}")
+        
+        with ExitStack() as stack:
+            shards = [stack.enter_context(safe_open(f, framework="pt")) for f in shard_files]
+            
+            # Group tensor names by layer prefix (None = everything outside a layer stack)
+            groups = {}
+            for shard in shards:
+                for name in shard.keys():
+                    if name not in expected_names:
+                        continue
+                    match = LAYER_PREFIX.match(name)
+                    groups.setdefault(match.group(1) if match else None, []).append((shard, name))
+            
+            def materialize(entries):
+                for shard, name in entries:
+                    set_module_tensor_to_device(
+                        model, name, "cpu",
+                        value=shard.get_tensor(name),
+                        dtype=torch.float32
+                    )
+            
+            materialize(groups.pop(None, []))
+            for prefix, entries in groups.items():
+                materialize(entries)
+                torch.ao.quantization.quantize_dynamic(
+                    model.get_submodule(prefix),
+                    {torch.nn.Linear},
+                    dtype=torch.qint8,
+                    inplace=True
+                )
+        
+        model.tie_weights()
+        missing = [name for name, param in model.named_parameters() if param.is_meta]
+        if missing:
+            raise RuntimeError(f"Checkpoint is missing {len(missing)} tensors, e.g. {missing[0]}")
+        
+        # Remaining Linear layers outside the layer stacks (projections, lm_head);
+        # in place, otherwise torch deep-copies every fp32 tensor still in the model
+        torch.ao.quantization.quantize_dynamic(
+            model,
+            {torch.nn.Linear},
+            dtype=torch.qint8,
+            inplace=True
+        )
+        self.direct_model = model
+        print(f"✅ Model loaded with INT8 Linear layers ({torch.backends.quantized.engine} engine)")
+    
+    def _compile_model(self):
+        """Compile the model forward with TorchInductor and pay the trace cost up front"""
+        print("🔧 Compiling model with torch.compile...")
+        # Keep compiled graphs under models/ (a mounted volume) so restarts
+        # load them from disk instead of re-tracing for a minute or more
+        os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", os.path.join("models", "_inductor_cache"))
+        os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+        if self.device.startswith("cuda"):
+            # Left padding keeps the bucketed prompt tokens adjacent to the generated ones
+            self.direct_processor.tokenizer.padding_side = "left"
+        
+        if self.compile_regional:
+            self._compile_repeated_blocks()
+            return
+        
+        if self.device.startswith("cuda"):
+            # reduce-overhead captures CUDA graphs
+            print("   🎯 CUDA graphs enabled via reduce-overhead mode")
+        # Only the text decoder is compiled: it runs on every decode step, while the
+        # vision and audio towers run once per prompt with a varying number of images
+        # and clip lengths, which would only add retraces. Only forward is compiled so
+        # generate()'s Python decode loop keeps working
+        target = self._get_language_model() or self.direct_model
+        eager_forward = target.forward
+        try:
+            target.forward = torch.compile(
+                eager_forward,
+                mode="reduce-overhead",
+                dynamic=True
+            )
+            self._warmup_model()
+            print("✅ Model compiled")
+        except Exception as e:
+            print(f"⚠️  torch.compile failed, using eager mode: {e}")
+            target.forward = eager_forward
+    
+    def _compile_repeated_blocks(self):
+        """Compile each repeated block (decoder layers etc.) in place instead of the whole forward"""
+        # One trace per block class is reused by every layer of that class, so the
+        # first compile takes a fraction of the whole-model time (no CUDA graphs)
+        block_classes = set(getattr(self.direct_model, "_no_split_modules", None) or [])
+        blocks = [
+            module for module in self.direct_model.modules()
+            if type(module).__name__ in block_classes
+        ]
+        if not blocks:
+            print("⚠️  No repeated blocks found, using eager mode")
+            return
+        
+        # The vision tower is outside those blocks; its input is always resized to the
+        # processor's fixed resolution, so it compiles once per frame count
+        vision_tower = self._get_vision_tower()
+        
+        try:
+            for block in blocks:
+                block.compile(dynamic=True, fullgraph=True)
+            if vision_tower is not None:
+                vision_tower.compile(
+                    mode="reduce-overhead" if self.device.startswith("cuda") else "default",
+                    dynamic=False
+                )
+            self._warmup_model()
+            print(f"✅ Compiled {len(blocks)} repeated blocks"
+                  + (" and the vision tower" if vision_tower is not None else ""))
+        except Exception as e:
+            print(f"⚠️  Regional compilation failed, using eager mode: {e}")
+            for module in blocks + ([vision_tower] if vision_tower is not None else []):
+                module._compiled_call_impl = None
+    
+    def _warmup_model(self):
+        """Run a tiny generate() so the first request doesn't pay for tracing"""
+        start_time = time.perf_counter()
+        dummy_inputs = self.direct_processor.tokenizer("Warm up", return_tensors="pt").to(self.device)
+        self.direct_model.generate(**dummy_inputs, max_new_tokens=4, do_sample=False)
+        print(f"   ⏱️  Warm-up took {time.perf_counter() - start_time:.2f} seconds")
+    
+    def _compile_chat_template(self):
+        """Compile the processor's Jinja chat template once instead of per request"""
+        template = getattr(self.direct_processor, "chat_template", None)
+        if not isinstance(template, str):
+            return None
+        
+        # Same environment transformers renders chat templates in
+        env = ImmutableSandboxedEnvironment(
+            trim_blocks=True,
+            lstrip_blocks=True,
+            extensions=[jinja2.ext.loopcontrols]
+        )
+        env.globals["raise_exception"] = _raise_template_error
+        return env.from_string(template)
+    
+    def _render_chat_template(self, messages: List[Dict]) -> str:
+        """Render messages into a prompt string, reusing the result for identical messages"""
+        try:
+            messages_json = json.dumps(messages, sort_keys=True)
+        except TypeError:
+            # Messages carrying objects (e.g. embedded images) are rendered every time
+            return self._render_chat_template_uncached(messages)
+        return self._render_chat_template_json(messages_json)
+    
+    def _render_chat_template_uncached(self, messages: List[Dict]) -> str:
+        """Render messages into a prompt string with the compiled chat template"""
+        if self._chat_template is None:
+            return self.direct_processor.apply_chat_template(messages, add_generation_prompt=True)
+        return self._chat_template.render(
+            messages=messages,
+            add_generation_prompt=True,
+            **self._special_tokens
+        )
+    
+    def _splice_triage_prompt(self, inputs) -> Dict:
+        """Insert the cached triage prompt ids before the user turn's closing <end_of_turn>"""
+        input_ids = inputs['input_ids']
+        # The last <end_of_turn> in the prompt closes the user turn the text belonged in
+        insert_at = int((input_ids[0] == self._end_of_turn_id).nonzero()[-1, 0])
+        prompt_ids = self._triage_prompt_ids
+        
+        spliced = {}
+        for key, value in inputs.items():
+            if key == 'input_ids':
+                piece = prompt_ids
+            elif torch.is_tensor(value) and value.shape[:2] == input_ids.shape:
+                # Prompt tokens are attended to and are plain text (type 0)
+                fill = 1 if key == 'attention_mask' else 0
+                piece = torch.full(prompt_ids.shape, fill, dtype=value.dtype)
+            else:
+                spliced[key] = value
+                continue
+            spliced[key] = torch.cat([value[:, :insert_at], piece, value[:, insert_at:]], dim=1)
+        return spliced
+    
+    def _move_inputs(self, inputs) -> Dict:
+        """Move processor outputs to the model device, casting only floating-point tensors"""
+        model_dtype = self._model_dtype
+        # Pinned host buffers let the H2D copies run asynchronously
+        use_pinned = self._on_cuda
+        moved = {}
+        for key, value in inputs.items():
+            if not torch.is_tensor(value):
+                moved[key] = value
+                continue
+            if use_pinned and value.device.type == "cpu":
+                value = value.pin_memory()
+            if value.is_floating_point():
+                moved[key] = value.to(self._torch_device, dtype=model_dtype, non_blocking=use_pinned)
+                if key == "pixel_values" and value.dim() == 4:
+                    # Match the channels_last layout of the vision tower weights
+                    moved[key] = moved[key].contiguous(memory_format=torch.channels_last)
             else:
-                print("⚠️  Unsloth not available, using standard model loading")
-                self._load_standard_model(local_model_path)
+                moved[key] = value.to(self._torch_device, non_blocking=use_pinned)
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            # isfinite covers NaN and Inf in one kernel; .item() syncs, hence debug only
+            for key, value in moved.items():
+                if torch.is_tensor(value) and value.is_floating_point():
+                    if not torch.isfinite(value).all().item():
+                        raise ValueError(f"Input tensor {key} has NaN/Inf")
+        return moved
+    
+    def _generate(self, inputs: Dict, max_new_tokens: int, streamer=None):
+        """Run generate() under the inference lock, reusing a cached prompt prefix if one applies"""
+        kwargs = self._generation_kwargs(max_new_tokens)
+        # cuDNN autotuning pays off for the vision convs, whose input is always resized
+        # to the processor's resolution; audio lengths vary per clip, so each new length
+        # would be re-tuned and audio requests keep the default heuristics
+        cudnn_flags = torch.backends.cudnn.flags(
+            enabled=torch.backends.cudnn.enabled,
+            benchmark='input_features' not in inputs,
+            deterministic=torch.backends.cudnn.deterministic,
+            allow_tf32=torch.backends.cudnn.allow_tf32
+        )
+        # Callers already run under inference_mode; entering it here keeps generate()
+        # free of autograd and view tracking whoever calls it
+        with self._inference_lock, torch.inference_mode(), cudnn_flags:
+            past_key_values = None
+            # Carried caches hold one sequence; generate() expands input_ids per beam
+            # but not a cache passed in, so beam search always prefills on its own.
+            # They are also plain DynamicCaches, so with a static or quantized cache
+            # configured, generate() builds that cache and prefills the whole prompt
+            reuse_cache = self.num_beams == 1 and 'cache_implementation' not in kwargs
+            if reuse_cache:
+                past_key_values = self._lookup_prefix_cache(inputs)
+                past_key_values = self._prefill_chunked(inputs, past_key_values)
+            
+            if kwargs.get('cache_implementation') == 'static':
+                # The static cache is sized to max_length and reused while it is big enough;
+                # rounding up keeps one cache (and one set of captured graphs) across
+                # prompts of similar length instead of reallocating it per request
+                total_len = inputs['input_ids'].shape[1] + kwargs.pop('max_new_tokens')
+                kwargs['max_length'] = -(-total_len // STATIC_CACHE_BUCKET) * STATIC_CACHE_BUCKET
+            
+            # GPU-side timing is debug only: reading it needs an event synchronize
+            timing_events = None
+            if self._on_cuda and logger.isEnabledFor(logging.DEBUG):
+                timing_events = (torch.cuda.Event(enable_timing=True), torch.cuda.Event(enable_timing=True))
+                timing_events[0].record()
             
-            self._model_loaded = True
-            print("✅ Direct model loaded successfully")
+            outputs = self.direct_model.generate(
+                **inputs,
+                **kwargs,
+                past_key_values=past_key_values,
+                streamer=streamer
+            )
+            
+            if timing_events is not None:
+                start_event, end_event = timing_events
+                end_event.record()
+                end_event.synchronize()
+                logger.debug("⏱️  generate() GPU time: %.1f ms", start_event.elapsed_time(end_event))
             
+            return outputs
+    
+    def _media_span(self, input_ids):
+        """(first, last + 1) positions of the image/audio placeholder tokens, (0, 0) if there are none"""
+        config = self.direct_model.config
+        media_token_ids = [
+            token_id for token_id in (getattr(config, "image_token_id", None),
+                                      getattr(config, "audio_token_id", None))
+            if token_id is not None
+        ]
+        if not media_token_ids:
+            return 0, 0
+        media_mask = torch.isin(input_ids[0], torch.tensor(media_token_ids, device=input_ids.device))
+        media_positions = media_mask.nonzero()
+        if len(media_positions) == 0:
+            return 0, 0
+        return int(media_positions[0, 0]), int(media_positions[-1, 0]) + 1
+    
+    def _forward_chunk(self, inputs: Dict, cache, start: int, end: int, with_media: bool):
+        """Run prompt tokens [start, end) through the model, appending their keys/values to cache"""
+        input_ids = inputs['input_ids']
+        chunk = {}
+        for key, value in inputs.items():
+            if key == 'attention_mask':
+                # The mask covers the cached tokens as well as the new ones
+                chunk[key] = value[:, :end]
+            elif torch.is_tensor(value) and value.shape[:2] == input_ids.shape:
+                chunk[key] = value[:, start:end]
+            elif with_media:
+                chunk[key] = value
+        attention_mask = inputs.get('attention_mask')
+        if attention_mask is not None:
+            # RoPE positions must skip left padding the way generate() numbers the decode
+            # steps; cache_position alone would count the pads
+            position_ids = attention_mask.long().cumsum(-1) - 1
+            position_ids.masked_fill_(attention_mask == 0, 1)
+            chunk['position_ids'] = position_ids[:, start:end]
+        self.direct_model(
+            **chunk,
+            past_key_values=cache,
+            use_cache=True,
+            cache_position=torch.arange(start, end, device=input_ids.device),
+            # Only generate() needs logits, so skip the vocab projection per chunk
+            logits_to_keep=1
+        )
+    
+    def _prefill_chunked(self, inputs: Dict, cache=None):
+        """
+        Prefill long prompts PREFILL_CHUNK tokens at a time so activation memory
+        scales with the chunk instead of the whole prompt
+        
+        Args:
+            inputs: Model inputs on the device
+            cache: KV cache already covering a prefix of the prompt (e.g. a reused
+                prefix cache), or None
+        
+        Returns:
+            KV cache covering all but the last prompt token (generate() still needs
+            one unprocessed token), or the given cache if nothing had to be prefilled
+        """
+        input_ids = inputs['input_ids']
+        prompt_len = input_ids.shape[1]
+        start = cache.get_seq_length() if cache is not None else 0
+        
+        # Image/audio features are scattered into the embeddings at their placeholder
+        # tokens, so the first chunk must reach the last placeholder and take all features.
+        # generate() only passes them when it starts from an empty cache, so media after
+        # a reused prefix always has to be prefilled here.
+        _, media_end = self._media_span(input_ids)
+        media_pending = cache is not None and media_end > start
+        if prompt_len - start <= PREFILL_CHUNK and not media_pending:
+            return cache
+        
+        logger.info(f"🧩 Chunked prefill: {prompt_len - start} prompt tokens in {PREFILL_CHUNK}-token chunks")
+        if cache is None:
+            cache = DynamicCache()
+        end = min(max(start + PREFILL_CHUNK, media_end), prompt_len - 1)
+        with_media = True
+        while start < end:
+            self._forward_chunk(inputs, cache, start, end, with_media)
+            with_media = False
+            start, end = end, min(end + PREFILL_CHUNK, prompt_len - 1)
+        return cache
+    
+    def _lookup_prefix_cache(self, inputs: Dict):
+        """
+        Reuse the KV cache of the text before the first image/audio token when an
+        earlier request had the same prefix (e.g. the triage prompt leading video
+        requests with triage_prompt_first; frames-first prompts have no text prefix)
+        
+        Returns:
+            A private copy of the prefix cache, or None for prompts without a long
+            shared-able prefix
+        """
+        input_ids = inputs['input_ids']
+        media_start, _ = self._media_span(input_ids)
+        if media_start < PREFIX_CACHE_MIN_TOKENS:
+            return None
+        
+        prefix_ids = input_ids[0, :media_start]
+        key = hashlib.sha256(prefix_ids.cpu().numpy().tobytes()).hexdigest()
+        cache = self._prefix_caches.pop(key, None)
+        if cache is None:
+            cache = DynamicCache()
+            self._forward_chunk(inputs, cache, 0, media_start, with_media=False)
+        else:
+            logger.info(f"♻️  Reusing KV cache for a {media_start}-token prompt prefix")
+        
+        self._prefix_caches[key] = cache
+        while len(self._prefix_caches) > MAX_PREFIX_CACHES:
+            self._prefix_caches.popitem(last=False)
+        # generate() appends to the cache in place, so it gets its own copy
+        return copy.deepcopy(cache)
+    
+    def _decode_response(self, outputs, input_len: int) -> str:
+        """Decode the tokens generated after the prompt, up to the first <end_of_turn>"""
+        # One device-to-host copy of the new tokens; the prompt is never decoded
+        generated_ids = outputs[0, input_len:].tolist()
+        
+        if self._end_of_turn_id in generated_ids:
+            generated_ids = generated_ids[:generated_ids.index(self._end_of_turn_id)]
+        
+        return self.direct_processor.tokenizer.decode(
+            generated_ids,
+            skip_special_tokens=True,
+            clean_up_tokenization_spaces=False
+        ).strip()
+    
+    def _generation_kwargs(self, max_new_tokens: int) -> Dict:
+        """generate() kwargs shared by the chat methods (greedy unless do_sample is set)"""
+        kwargs = {
+            'max_new_tokens': max_new_tokens,
+            'use_cache': True,
+            'num_beams': self.num_beams,
+            'pad_token_id': self._eos_id,
+            # Stop at the end of the model turn instead of running to max_new_tokens
+            'eos_token_id': [self._eos_id, self._end_of_turn_id],
+        }
+        if self.quantize_kv_cache:
+            # 4-bit keys (per channel) and values (per token), KIVI style: the long
+            # multi-frame prompts' cache takes a quarter of the memory and bandwidth
+            kwargs['cache_implementation'] = 'quantized'
+            kwargs['cache_config'] = {"backend": "HQQ", "nbits": 4, "axis-key": 0, "axis-value": 1}
+        elif self.compile_model and self._on_cuda:
+            # generate() allocates the static cache once and resets it in place
+            # on later calls, instead of growing fresh KV tensors per request
+            kwargs['cache_implementation'] = 'static'
+        if self.do_sample:
+            kwargs.update(do_sample=True, temperature=self.temperature,
+                          top_p=self.top_p, top_k=self.top_k)
+        else:
+            # Triage output (RED/YELLOW/GREEN/BLACK) should be deterministic
+            kwargs['do_sample'] = False
+        return kwargs
+    
+    def _padding_kwargs(self) -> Dict:
+        """Processor kwargs that bucket prompt lengths so CUDA graphs replay instead of re-capturing"""
+        if not (self.compile_model and self._on_cuda):
+            return {}
+        return {"padding": True, "pad_to_multiple_of": PAD_BUCKET}
+    
+    def _get_vision_tower(self):
+        """Vision encoder submodule of the loaded model (None if it has none)"""
+        model = getattr(self.direct_model, "model", self.direct_model)
+        return getattr(model, "vision_tower", None)
+    
+    def _get_language_model(self):
+        """Text decoder submodule of the loaded model (None if it has none)"""
+        model = getattr(self.direct_model, "model", self.direct_model)
+        return getattr(model, "language_model", None)
+    
+    def _get_audio_tower(self):
+        """Audio encoder submodule of the loaded model (None if it has none)"""
+        model = getattr(self.direct_model, "model", self.direct_model)
+        return getattr(model, "audio_tower", None)
+    
+    def _get_attn_implementation(self) -> str:
+        """Pick the fused attention kernel (FlashAttention-2 on Ampere+ CUDA, SDPA otherwise)"""
+        # FlashAttention-2 has no kernels before sm80; Turing/Volta cards fall back to SDPA
+        if (self.device.startswith("cuda") and FLASH_ATTN_AVAILABLE
+                and torch.cuda.get_device_capability(self.device)[0] >= 8):
+            return "flash_attention_2"
+        return "sdpa"
+    
+    def _stream_state_dict(self, local_model_path: str, device_map) -> Optional[Dict]:
+        """Read safetensors shards with the run:ai streamer (None falls back to stock loading)"""
+        if not RUNAI_STREAMER_AVAILABLE:
+            return None
+        
+        shard_files = sorted(
+            os.path.join(local_model_path, name)
+            for name in os.listdir(local_model_path)
+            if name.endswith(".safetensors")
+        )
+        if not shard_files:
+            return None
+        
+        print(f"🚀 Streaming {len(shard_files)} weight shards with run:ai streamer...")
+        os.environ.setdefault("RUNAI_STREAMER_CONCURRENCY", "16")
+        # Stream straight to the target device unless the model is split across devices
+        target_device = device_map if isinstance(device_map, str) and device_map != "auto" else "cpu"
+        
+        state_dict = {}
+        try:
+            with SafetensorsStreamer() as streamer:
+                for shard_file in shard_files:
+                    streamer.stream_file(shard_file)
+                    for name, tensor in streamer.get_tensors():
+                        # Streamed tensors share the streamer's buffer, so copy them out
+                        state_dict[name] = tensor.to(target_device, copy=True)
         except Exception as e:
-            print(f"❌ Failed to load direct model: {e}")
-            raise
+            print(f"⚠️  run:ai streaming failed, using standard loading: {e}")
+            return None
+        
+        return state_dict
+    
+    def _offload_max_memory(self) -> Dict:
+        """accelerate max_memory for offload=True: the constructor's, or sized from free VRAM and RAM"""
+        if self.max_memory is not None:
+            return self.max_memory
+        
+        device_index = self._torch_device.index or 0
+        free_vram, total_vram = torch.cuda.mem_get_info(device_index)
+        # The allocator won't go past the per-process fraction of total VRAM
+        gpu_budget = min(free_vram, total_vram * self._memory_fraction) * OFFLOAD_WEIGHT_SHARE
+        cpu_budget = psutil.virtual_memory().available * OFFLOAD_WEIGHT_SHARE
+        if self._gpu_static.get('is_jetson'):
+            # One pool of RAM: what the GPU side is planned to take, the CPU side can't also have
+            cpu_budget = max(cpu_budget - gpu_budget, 0)
+        return {device_index: int(gpu_budget), "cpu": int(cpu_budget)}
+    
+    def _get_device_map(self):
+        """Device map for the model (vision tower on CPU when offload_vision is set)"""
+        if not self.offload_vision:
+            return self.device
+        
+        # The vision tower runs once per prompt, so keeping it CPU-resident frees
+        # VRAM for decoding; accelerate's hooks move its features onto the GPU.
+        print("   🎯 Vision tower offloaded to CPU, language model on GPU")
+        return {
+            "model.vision_tower": "cpu",
+            "model.embed_vision": "cpu",
+            "model.audio_tower": self.device,
+            "model.embed_audio": self.device,
+            "model.language_model": self.device,
+            "lm_head": self.device,
+        }
+    
+    @staticmethod
+    def _summarize_messages(messages: List[Dict]) -> str:
+        """Short debug view of messages: content lists are reduced to their item count"""
+        summary = [
+            {key: (f"<{len(value)} items>" if isinstance(value, list) else value)
+             for key, value in message.items()}
+            for message in messages
+        ]
+        # default=str covers anything non-JSON (e.g. an embedded PIL image)
+        return json.dumps(summary, default=str)
+    
+    def _resolve_images(self, image_items: List[Dict]) -> List[Image.Image]:
+        """
+        Turn image message items into PIL images, in message order
+        
+        Args:
+            image_items: Items with an embedded "image", or a "path"/"url" to load
+        
+        Returns:
+            Loaded images (items that fail to load are skipped)
+        """
+        # Handle both embedded image objects and image paths/URLs
+        sources = [None if "image" in item else (item.get("path") or item.get("url"))
+                   for item in image_items]
+        to_load = [source for source in sources if source]
+        
+        loaded = {}
+        if len(to_load) > 1:
+            # Downloads and JPEG decodes release the GIL, so fetch them concurrently
+            with ThreadPoolExecutor(max_workers=min(4, len(to_load))) as executor:
+                loaded = dict(zip(to_load, executor.map(self.load_image_from_url_or_path, to_load)))
+        elif to_load:
+            loaded[to_load[0]] = self.load_image_from_url_or_path(to_load[0])
+        
+        images = []
+        for item, source in zip(image_items, sources):
+            image = item["image"] if "image" in item else loaded.get(source)
+            if image is not None:
+                images.append(image)
+        return images
     
     def load_image_from_url_or_path(self, image_source):
         """Load image from URL or local path"""
         try:
             if image_source.startswith(('http://', 'https://')):
-                print(f"📥 Downloading image from URL: {image_source}")
-                response = requests.get(image_source, timeout=10)
-                response.raise_for_status()
-                image = Image.open(BytesIO(response.content)).convert("RGB")
-                print(f"✅ Image downloaded successfully: {image.size}")
+                logger.info(f"📥 Downloading image from URL: {image_source}")
+                # Separate connect/read timeouts: an unreachable host fails after ~3s
+                with self._http.get(image_source, timeout=(3.05, 10), stream=True) as response:
+                    response.raise_for_status()
+                    # Decode straight from the socket instead of buffering response.content
+                    response.raw.decode_content = True
+                    image = Image.open(response.raw).convert("RGB")
+                logger.info(f"✅ Image downloaded successfully: {image.size}")
             else:
-                print(f" Loading image from local path: {image_source}")
+                logger.info(f" Loading image from local path: {image_source}")
                 image = Image.open(image_source).convert("RGB")
-                print(f"✅ Image loaded successfully: {image.size}")
+                logger.info(f"✅ Image loaded successfully: {image.size}")
             return image
         except Exception as e:
-            print(f"❌ Error loading image: {e}")
+            logger.error(f"❌ Error loading image: {e}")
             return None
 
+    def _prepare_text_inputs(self, messages: List[Dict]) -> Dict:
+        """Flatten the user text into one turn and build model inputs (with the dummy image) on the device"""
+        # For text-only conversations, we need to handle it differently
+        # since the finetuned model is multimodal (image+text)
+        
+        # Extract text from messages
+        parts = []
+        for message in messages:
+            if message.get("role") == "user":
+                content = message.get("content", "")
+                if isinstance(content, list):
+                    # Handle multimodal content
+                    for item in content:
+                        if isinstance(item, dict) and item.get("type") == "text":
+                            parts.append(item.get("text", ""))
+                elif isinstance(content, str):
+                    parts.append(content)
+        
+        text_content = " ".join(parts).strip()
+        logger.debug("🔊 Extracted text content: %s", text_content)
+        
+        # Create a simple text prompt for the model
+        # Since this is a multimodal model, we'll create a text-only conversation
+        text_messages = [
+            {
+                "role": "user",
+                "content": text_content
+            }
+        ]
+        
+        # Apply chat template
+        input_text = self._render_chat_template(text_messages)
+        
+        # Since this is a multimodal model, it always requires an image
+        # Use a dummy white image for text-only conversations
+        logger.debug("🖼️  Using dummy image for text-only conversation (model requires image)")
+        full_image_sequence = getattr(self.direct_processor, "full_image_sequence", None)
+        if full_image_sequence is None:
+            # Process with dummy image (same format as your Colab)
+            inputs = self.direct_processor(
+                Image.new('RGB', (224, 224), color='white'),
+                input_text,
+                add_special_tokens=False,
+                return_tensors="pt",
+                **self._padding_kwargs()
+            )
+            inputs = self._move_inputs(inputs)
+        else:
+            # The dummy image never changes, so only the text is processed per request:
+            # expand the image placeholder like the processor does and reuse the
+            # dummy pixel values that were preprocessed and moved to the device once
+            inputs = self.direct_processor.tokenizer(
+                input_text.replace(self.direct_processor.image_token, full_image_sequence),
+                add_special_tokens=False,
+                return_tensors="pt",
+                **self._padding_kwargs()
+            )
+            inputs = self._move_inputs(inputs)
+            inputs['pixel_values'] = self._get_dummy_pixel_values()
+        logger.debug("✅ Using dummy image processing for text conversation")
+        logger.debug(f"🚀 Using {self.device} for text inference")
+        return inputs
+    
+    def _get_dummy_pixel_values(self):
+        """Preprocessed pixel values of the white text-only dummy image, on the model device"""
+        if self._dummy_pixel_values is None:
+            dummy_image = Image.new('RGB', (224, 224), color='white')
+            pixel_values = self.direct_processor.image_processor(dummy_image, return_tensors="pt")['pixel_values']
+            self._dummy_pixel_values = self._move_inputs({'pixel_values': pixel_values})['pixel_values']
+        return self._dummy_pixel_values
+    
+    def chat_text_stream(self, messages: List[Dict]):
+        """
+        Stream a text-only chat response while it is generated
+        
+        The model is loaded and the inputs are built before this returns, so those
+        errors raise here instead of inside the returned iterator.
+        
+        Args:
+            messages: List of message dictionaries
+        
+        Returns:
+            Iterator of decoded text chunks, the first one as soon as the prompt is
+            prefilled; it re-raises a generation error once the streamed text is drained
+        """
+        if not self._model_loaded:
+            self._load_direct_model()
+        
+        if not self.direct_model or not self.direct_processor:
+            raise Exception("Direct model not loaded")
+        
+        logger.info("🔊 Streaming text chat request")
+        with torch.inference_mode():
+            inputs = self._prepare_text_inputs(messages)
+        
+        streamer = TextIteratorStreamer(
+            self.direct_processor.tokenizer,
+            skip_prompt=True,
+            skip_special_tokens=True
+        )
+        errors = []
+        # Set once the consumer has taken text, so an OOM retry never repeats output
+        streamed = threading.Event()
+        attempts = []
+        
+        def generate_once():
+            if attempts and (streamed.is_set() or streamer.token_cache or not streamer.text_queue.empty()):
+                raise RuntimeError("CUDA out of memory after the response started streaming")
+            attempts.append(None)
+            # generate() passes the prompt through the streamer first; skip it again on a retry
+            streamer.next_tokens_are_prompt = True
+            # Same path as chat_text (prefix reuse, chunked prefill, cache sizing);
+            # _generate enters inference_mode itself, which is thread-local
+            return self._generate(inputs, max_new_tokens=512, streamer=streamer)
+        
+        def run_generate():
+            try:
+                self._run_with_oom_retry(generate_once)
+            except Exception as e:
+                logger.exception("🔊 Streaming text inference error: %s", e)
+                errors.append(e)
+                # Unblock the consumer instead of leaving it waiting on the queue
+                streamer.end()
+        
+        def stream():
+            for text in streamer:
+                streamed.set()
+                yield text
+            if errors:
+                raise errors[0]
+        
+        threading.Thread(target=run_generate, daemon=True).start()
+        return stream()
+    
     def chat_text(self, messages: List[Dict]) -> Dict:
         """
         Send text-only chat request using direct model loading
@@ -176,107 +1272,31 @@ class ModelManagerPipeline:
             if not self.direct_model or not self.direct_processor:
                 raise Exception("Direct model not loaded")
             
-            print(f"🔊 Using direct model for text")
-            print(f"🔊 Text chat request:")
-            print(f"   Messages: {json.dumps(messages, indent=2)}")
-            
-            start_time = time.time()
-            
-            # For text-only conversations, we need to handle it differently
-            # since the finetuned model is multimodal (image+text)
-            
-            # Extract text from messages
-            text_content = ""
-            for message in messages:
-                if message.get("role") == "user":
-                    content = message.get("content", "")
-                    if isinstance(content, list):
-                        # Handle multimodal content
-                        for item in content:
-                            if isinstance(item, dict) and item.get("type") == "text":
-                                text_content += item.get("text", "") + " "
-                    elif isinstance(content, str):
-                        text_content += content + " "
-            
-            text_content = text_content.strip()
-            print(f"🔊 Extracted text content: {text_content}")
-            
-            # Create a simple text prompt for the model
-            # Since this is a multimodal model, we'll create a text-only conversation
-            text_messages = [
-                {
-                    "role": "user",
-                    "content": text_content
-                }
-            ]
+            logger.info("🔊 Using direct model for text")
+            logger.info("🔊 Text chat request:")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("   Messages: %s", self._summarize_messages(messages))
             
-            # Apply chat template
-            input_text = self.direct_processor.apply_chat_template(
-                text_messages,
-                add_generation_prompt=True
-            )
+            start_time = time.perf_counter()
             
-            # Since this is a multimodal model, it always requires an image
-            # Use a dummy white image for text-only conversations
-            dummy_image = Image.new('RGB', (224, 224), color='white')
-            print("🖼️  Using dummy image for text-only conversation (model requires image)")
-            
-            # Process with dummy image (same format as your Colab)
-            inputs = self.direct_processor(
-                dummy_image,
-                input_text,
-                add_special_tokens=False,
-                return_tensors="pt"
-            )
-            print("✅ Using dummy image processing for text conversation")
-            
-            # Move to appropriate device (CUDA if available, otherwise CPU)
-            if torch.cuda.is_available():
-                inputs = inputs.to("cuda")
-                print("🚀 Using CUDA for text inference")
-            else:
-                inputs = inputs.to("cpu")
-                print("🚀 Using CPU for text inference")
-            
-            print(f"🔊 Inputs processed, shape: {inputs['input_ids'].shape}")
-            
-            # Generate response (same parameters as your Colab)
-            outputs = self.direct_model.generate(
-                **inputs, 
-                max_new_tokens=512,  # Increased from 256
-                use_cache=True, 
-                temperature=1.0,  # Changed from 0.7
-                top_p=0.95, 
-                top_k=64
-            )
-            
-            # Decode response
-            decoded_outputs = self.direct_processor.batch_decode(
-                outputs,
-                skip_special_tokens=False,
-                clean_up_tokenization_spaces=False
-            )
-            
-            if isinstance(decoded_outputs, list) and len(decoded_outputs) > 0:
-                response_text = decoded_outputs[0]
-            else:
-                response_text = str(decoded_outputs)
-            
-            # Extract just the model's response (after <start_of_turn>model)
-            if '<start_of_turn>model' in response_text:
-                model_response = response_text.split('<start_of_turn>model')[-1]
-                if '<end_of_turn>' in model_response:
-                    model_response = model_response.split('<end_of_turn>')[0]
-                # Clean up any remaining special tokens
-                model_response = model_response.replace('<bos>', '').replace('<eos>', '').strip()
-            else:
-                model_response = response_text
+            with torch.inference_mode():
+                inputs = self._prepare_text_inputs(messages)
+                
+                logger.debug("🔊 Inputs processed, shape: %s", tuple(inputs['input_ids'].shape))
+                
+                # Generate response (retried once on OOM, after releasing the VRAM reservation)
+                outputs = self._run_with_oom_retry(
+                    lambda: self._generate(inputs, max_new_tokens=512)
+                )
+                
+                # Decode only the generated tokens (prompt tokens are sliced off)
+                model_response = self._decode_response(outputs, inputs['input_ids'].shape[1])
             
-            end_time = time.time()
+            end_time = time.perf_counter()
             inference_time = end_time - start_time
             
-            print(f"🔊 Text response: {model_response}")
-            print(f"⏱️  Text inference time: {inference_time:.2f} seconds")
+            logger.debug("🔊 Text response: %s", model_response)
+            logger.info("⏱️  Text inference time: %.2f seconds", inference_time)
             
             return {
                 'success': True,
@@ -287,21 +1307,20 @@ class ModelManagerPipeline:
             }
             
         except Exception as e:
-            import traceback
-            print(f"🔊 Text inference error: {e}")
-            print(f"🔊 Full traceback: {traceback.format_exc()}")
+            logger.exception("🔊 Text inference error: %s", e)
             return {
                 'success': False,
                 'error': str(e),
                 'mode': 'text-direct'
             }
 
-    def chat_image(self, messages: List[Dict]) -> Dict:
+    def chat_image(self, messages: List[Dict], max_new_tokens: int = 512) -> Dict:
         """
         Send image analysis request using direct model loading
         
         Args:
             messages: List of message dictionaries (images should be embedded in messages)
+            max_new_tokens: Cap on generated tokens
         
         Returns:
             Dictionary with response and metadata
@@ -314,111 +1333,123 @@ class ModelManagerPipeline:
             if not self.direct_model or not self.direct_processor:
                 raise Exception("Direct model not loaded")
             
-            print(f"🔊 Using direct model for image analysis")
-            print(f"🔊 Image chat request:")
-            print(f"   Messages: {json.dumps(messages, indent=2)}")
+            logger.info("🔊 Using direct model for image analysis")
+            logger.info("🔊 Image chat request:")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("   Messages: %s", self._summarize_messages(messages))
             
-            start_time = time.time()
-            
-            # Extract image and text from messages (compatible with Colab approach)
-            image = None
+            # Extract images and text from messages (compatible with Colab approach)
+            image_items = []
             prompt_text = ""
+            text_first = False
             
             for msg in messages:
                 if isinstance(msg.get("content"), list):
                     for item in msg["content"]:
                         if isinstance(item, dict):
                             if item.get("type") == "image":
-                                # Handle both embedded image objects and image paths/URLs
-                                if "image" in item:
-                                    image = item["image"]
-                                elif "path" in item:
-                                    # Load image from path/URL
-                                    image = self.load_image_from_url_or_path(item["path"])
-                                elif "url" in item:
-                                    # Load image from URL
-                                    image = self.load_image_from_url_or_path(item["url"])
+                                image_items.append(item)
                             elif item.get("type") == "text":
                                 prompt_text = item.get("text", "")
+                                text_first = text_first or not image_items
+            
+            images = self._resolve_images(image_items)
             
-            if image is None:
+            if not images:
                 return {
                     'success': False,
                     'error': 'No image found in messages',
                     'mode': 'image-direct'
                 }
+        except Exception as e:
+            logger.exception("🔊 Image inference error: %s", e)
+            return {
+                'success': False,
+                'error': str(e),
+                'mode': 'image-direct'
+            }
+        
+        return self.chat_images(images, prompt_text, prompt_first=text_first,
+                                max_new_tokens=max_new_tokens)
+    
+    def chat_images(self, images: List[Image.Image], prompt: str, prompt_first: bool = False,
+                    max_new_tokens: int = 512) -> Dict:
+        """
+        Analyze one or more in-memory images with a single prompt in one forward pass
+        
+        Args:
+            images: PIL images (e.g. extracted video frames), encoded together by the vision tower
+            prompt: Text prompt for the images
+            prompt_first: Put the prompt before the images, so requests sharing it
+                share a cacheable KV prefix
+            max_new_tokens: Cap on generated tokens
+        
+        Returns:
+            Dictionary with response and metadata
+        """
+        try:
+            # Load model if not already loaded
+            if not self._model_loaded:
+                self._load_direct_model()
             
-            # Use Colab-compatible approach
-            print(f"🔊 Processing image with Colab-compatible method")
+            start_time = time.perf_counter()
             
-            # Create messages in Colab format
+            # Use Colab-compatible approach
+            logger.info(f"🔊 Processing {len(images)} image(s) with Colab-compatible method")
+            
+            # The static triage prompt after the frames (chat_video's default order) is
+            # spliced in as pre-tokenized ids instead of being re-tokenized per request
+            # (not when padding, which must come last)
+            splice_triage_prompt = (prompt == MEDICAL_TRIAGE_PROMPT
+                                    and not prompt_first
+                                    and self._triage_prompt_ids is not None
+                                    and not self._padding_kwargs())
+            
+            # Create messages in Colab format (one image placeholder per image)
+            image_content = [{"type": "image"}] * len(images)
+            text_content = [{"type": "text", "text": "" if splice_triage_prompt else prompt}]
             colab_messages = [
                 {
                     "role": "user",
-                    "content": [{"type": "image"}, {"type": "text", "text": prompt_text}],
+                    "content": text_content + image_content if prompt_first else image_content + text_content,
                 }
             ]
             
-            # Apply chat template like Colab
-            input_text = self.direct_processor.apply_chat_template(
-                colab_messages, 
-                add_generation_prompt=True
-            )
-            
-            # Process inputs like Colab
-            inputs = self.direct_processor(
-                image,
-                input_text,
-                add_special_tokens=False,
-                return_tensors="pt"
-            )
-            
-            # Move to appropriate device (CUDA if available, otherwise CPU)
-            if torch.cuda.is_available():
-                inputs = inputs.to("cuda")
-                print("🚀 Using CUDA for inference")
-            else:
-                inputs = inputs.to("cpu")
-                print("🚀 Using CPU for inference")
-            
-            print(f"🔊 Inputs processed, shape: {inputs['input_ids'].shape}")
-            
-            # Generate with Colab parameters
-            outputs = self.direct_model.generate(
-                **inputs,
-                max_new_tokens=512,  # Increased for better responses
-                temperature=1.0,
-                top_p=0.95,
-                top_k=64,
-                use_cache=True
-            )
-            
-            # Decode response
-            decoded_outputs = self.direct_processor.batch_decode(
-                outputs,
-                skip_special_tokens=False,
-                clean_up_tokenization_spaces=False
-            )
-            
-            if isinstance(decoded_outputs, list) and len(decoded_outputs) > 0:
-                response_text = decoded_outputs[0]
-            else:
-                response_text = str(decoded_outputs)
-            
-            # Extract just the model's response
-            if '<start_of_turn>model' in response_text:
-                model_response = response_text.split('<start_of_turn>model')[-1]
-                if '<end_of_turn>' in model_response:
-                    model_response = model_response.split('<end_of_turn>')[0]
-                model_response = model_response.replace('<bos>', '').replace('<eos>', '').strip()
-            else:
-                model_response = response_text
+            with torch.inference_mode():
+                # Apply chat template like Colab
+                input_text = self._render_chat_template(colab_messages)
+                
+                # Process inputs like Colab; the PIL images go straight to the
+                # processor as a single sample, with no encode/decode round-trip
+                inputs = self.direct_processor(
+                    [images],
+                    input_text,
+                    add_special_tokens=False,
+                    return_tensors="pt",
+                    **self._padding_kwargs()
+                )
+                if splice_triage_prompt:
+                    inputs = self._splice_triage_prompt(inputs)
+                
+                # Move to the model device; only floating tensors take the model dtype
+                inputs = self._move_inputs(inputs)
+                logger.debug(f"🚀 Using {self.device} for inference")
+                
+                logger.debug("🔊 Inputs processed, shape: %s", tuple(inputs['input_ids'].shape))
+                
+                # Generate response (retried once on OOM, after releasing the VRAM reservation)
+                outputs = self._run_with_oom_retry(
+                    lambda: self._generate(inputs, max_new_tokens=max_new_tokens)
+                )
+                
+                # Decode only the generated tokens (prompt tokens are sliced off)
+                model_response = self._decode_response(outputs, inputs['input_ids'].shape[1])
             
-            end_time = time.time()
+            end_time = time.perf_counter()
             inference_time = end_time - start_time
             
-            print(f"🔊 Image response: {model_response}")
-            print(f"⏱️  Image inference time: {inference_time:.2f} seconds")
+            logger.debug("🔊 Image response: %s", model_response)
+            logger.info("⏱️  Image inference time: %.2f seconds", inference_time)
             
             return {
                 'success': True,
@@ -429,14 +1460,19 @@ class ModelManagerPipeline:
             }
             
         except Exception as e:
-            import traceback
-            print(f"🔊 Image inference error: {e}")
-            print(f"🔊 Full traceback: {traceback.format_exc()}")
-            return {
-                'success': False,
-                'error': str(e),
-                'mode': 'image-direct'
-            }
+            logger.exception("🔊 Image inference error: %s", e)
+            error = str(e)
+            out_of_memory = isinstance(e, torch.cuda.OutOfMemoryError)
+        
+        # Multi-frame video prompts are the likeliest to run out of memory; the cache is
+        # only emptied then, since it's what keeps later allocations cheap
+        if out_of_memory:
+            self._release_cuda_memory()
+        return {
+            'success': False,
+            'error': error,
+            'mode': 'image-direct'
+        }
         # Note: If probability tensor errors persist, consider updating model weights or preprocessing pipeline.
     
     def chat_video(self, messages: List[Dict]) -> Dict:
@@ -450,8 +1486,13 @@ class ModelManagerPipeline:
             Dictionary with response and metadata
         """
         try:
-            print(f"🎬 === MODEL MANAGER PIPELINE VIDEO START ===")
-            print(f"   Messages received: {json.dumps(messages, indent=2)}")
+            logger.info("🎬 === MODEL MANAGER PIPELINE VIDEO START ===")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("   Messages received: %s", self._summarize_messages(messages))
+            
+            # Load model if not already loaded (frame extraction needs the processor's input size)
+            if not self._model_loaded:
+                self._load_direct_model()
             
             # Extract video path from messages
             video_path = None
@@ -463,29 +1504,32 @@ class ModelManagerPipeline:
                             break
             
             if not video_path:
-                print(f"❌ No video path found in messages")
+                logger.error("❌ No video path found in messages")
                 return {
                     'success': False,
                     'error': 'No video path found in messages',
                     'mode': 'video-direct'
                 }
             
-            print(f"🔊 Video analysis request:")
-            print(f"   Video path: {video_path}")
+            logger.info("🔊 Video analysis request:")
+            logger.info(f"   Video path: {video_path}")
             
-            # Check if video file exists
-            print(f"🔍 Checking if video file exists: {video_path}")
-            file_exists = os.path.exists(video_path)
-            print(f"   File exists: {file_exists}")
+            # Check if video file exists (one stat gives both existence and size)
+            logger.debug(f"🔍 Checking if video file exists: {video_path}")
+            try:
+                video_size = os.stat(video_path).st_size
+            except FileNotFoundError:
+                video_size = None
+            logger.debug(f"   File exists: {video_size is not None}")
             
-            if not file_exists:
-                print(f"❌ Video file not found: {video_path}")
+            if video_size is None:
+                logger.error(f"❌ Video file not found: {video_path}")
                 # List contents of the directory
                 dir_path = os.path.dirname(video_path)
                 if os.path.exists(dir_path):
-                    print(f"   Directory contents: {os.listdir(dir_path)}")
+                    logger.info(f"   Directory contents: {os.listdir(dir_path)}")
                 else:
-                    print(f"   Directory does not exist: {dir_path}")
+                    logger.info(f"   Directory does not exist: {dir_path}")
                 
                 return {
                     'success': False,
@@ -493,29 +1537,24 @@ class ModelManagerPipeline:
                     'mode': 'video-direct'
                 }
             
-            start_time = time.time()
+            start_time = time.perf_counter()
             
             # Extract frames from video
             frames = self._extract_video_frames(video_path)
             
             if not frames:
-                print(f"❌ No frames extracted from video: {video_path}")
+                logger.error(f"❌ No frames extracted from video: {video_path}")
                 # Try to get more info about the video file
-
-                if os.path.exists(video_path):
-                    print(f"   File size: {os.path.getsize(video_path)} bytes")
-                    # Try to check if it's a valid video file
-                    import subprocess
-                    try:
-                        result = subprocess.run(['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', '-show_streams', video_path], capture_output=True, text=True)
-                        if result.returncode == 0:
-                            print(f"   Video file is valid according to ffprobe")
-                        else:
-                            print(f"   Video file may be corrupted or unsupported format")
-                    except:
-                        print(f"   Could not check video format with ffprobe")
-                else:
-                    print(f"   Video file does not exist")
+                logger.info(f"   File size: {video_size} bytes")
+                # Try to check if it's a valid video file
+                try:
+                    result = subprocess.run(['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', '-show_streams', video_path], capture_output=True, text=True)
+                    if result.returncode == 0:
+                        logger.info("   Video file is valid according to ffprobe")
+                    else:
+                        logger.info("   Video file may be corrupted or unsupported format")
+                except:
+                    logger.info("   Could not check video format with ffprobe")
                 
                 return {
                     'success': False,
@@ -523,63 +1562,23 @@ class ModelManagerPipeline:
                     'mode': 'video-direct'
                 }
             
-            print(f"🔊 Extracted {len(frames)} frames from video")
-            
-            # Create a single message with all frames
-            print(f"🔊 Creating video analysis message with {len(frames)} frames")
-            
-            # Save frames and create content list
-            content = []
-            saved_frames = []
-            
-            print(f"🔊 Saving {len(frames)} frames...")
-            save_start = time.time()
-            
-            for i, frame in enumerate(frames):
-                # Save frame to uploads directory
-                timestamp = int(time.time() * 1000)
-                frame_filename = f"video_frame_{timestamp}_{i}.jpg"
-                frame_path = os.path.join("uploads", frame_filename)
-                frame.save(frame_path, format='JPEG')
-                saved_frames.append(frame_path)
-                
-                # Add frame to content
-                content.append({"type": "image", "url": frame_path})
-            
-            save_time = time.time() - save_start
-            print(f"🔊 Frame saving completed in {save_time:.2f} seconds")
-            
-            # Add structured text prompt for medical triage assessment
-            structured_prompt = MEDICAL_TRIAGE_PROMPT
-            
-            content.append({"type": "text", "text": structured_prompt})
-            
-            # Create single message with all frames
-            video_messages = [
-                {
-                    "role": "user",
-                    "content": content
-                }
-            ]
-            
-            # Use the same image analysis method (which now handles multiple images)
-            print(f"🔊 Starting image analysis for {len(frames)} frames...")
-            analysis_start = time.time()
-            result = self.chat_image(video_messages)
-            analysis_time = time.time() - analysis_start
-            print(f"🔊 Image analysis completed in {analysis_time:.2f} seconds")
+            logger.info(f"🔊 Extracted {len(frames)} frames from video")
             
-            # Clean up frame files
-            for frame_path in saved_frames:
-                try:
-                    os.remove(frame_path)
-                except:
-                    pass
+            # All frames go through the vision tower in one batch, followed by the
+            # structured medical triage prompt; frames stay in memory (nothing is written
+            # to uploads/). Only with triage_prompt_first does the prompt lead and form a
+            # KV prefix shared across videos, and only without a static or quantized cache
+            logger.info(f"🔊 Starting image analysis for {len(frames)} frames...")
+            analysis_start = time.perf_counter()
+            result = self.chat_images(frames, MEDICAL_TRIAGE_PROMPT, prompt_first=self.triage_prompt_first,
+                                      max_new_tokens=TRIAGE_MAX_NEW_TOKENS)
+            end_time = time.perf_counter()
+            analysis_time = end_time - analysis_start
+            logger.info(f"🔊 Image analysis completed in {analysis_time:.2f} seconds")
             
-            end_time = time.time()
             inference_time = end_time - start_time
             
-            print(f"🔊 Video analysis completed in {inference_time:.2f} seconds")
+            logger.info(f"🔊 Video analysis completed in {inference_time:.2f} seconds")
             
             # Add video-specific metadata to the result
             if result['success']:
@@ -590,9 +1589,7 @@ class ModelManagerPipeline:
             return result
             
         except Exception as e:
-            import traceback
-            print(f"🔊 Video analysis error: {e}")
-            print(f"🔊 Full traceback: {traceback.format_exc()}")
+            logger.exception("🔊 Video analysis error: %s", e)
             return {
                 'success': False,
                 'error': str(e),
@@ -612,24 +1609,21 @@ class ModelManagerPipeline:
         """
         try:
             
-            print(f"🔊 Starting video frame extraction:")
-            print(f"   Video path: {video_path}")
-            print(f"   File exists: {os.path.exists(video_path)}")
-            print(f"   File size: {os.path.getsize(video_path) if os.path.exists(video_path) else 'N/A'} bytes")
+            logger.info("🔊 Starting video frame extraction:")
+            logger.info(f"   Video path: {video_path}")
             
-            # Open video file
-            cap = cv2.VideoCapture(video_path)
+            # Open video file (a missing file fails the isOpened() check below)
+            cap = self._open_video(video_path)
             
             if not cap.isOpened():
-                print(f"❌ Could not open video file: {video_path}")
-                print(f"   Trying to check video format...")
+                logger.error(f"❌ Could not open video file: {video_path}")
+                logger.info("   Trying to check video format...")
                 # Try to get more info about the file
-                import subprocess
                 try:
                     result = subprocess.run(['file', video_path], capture_output=True, text=True)
-                    print(f"   File type: {result.stdout.strip()}")
+                    logger.info(f"   File type: {result.stdout.strip()}")
                 except:
-                    print(f"   Could not determine file type")
+                    logger.info("   Could not determine file type")
                 return []
             
             # Get video properties
@@ -639,10 +1633,10 @@ class ModelManagerPipeline:
             width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
             height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
             
-            print(f"🔊 Video info: {total_frames} frames, {fps:.2f} fps, {duration:.2f}s duration, {width}x{height}")
+            logger.info(f"🔊 Video info: {total_frames} frames, {fps:.2f} fps, {duration:.2f}s duration, {width}x{height}")
             
             if total_frames <= 0:
-                print(f"❌ Invalid video: {total_frames} frames")
+                logger.error(f"❌ Invalid video: {total_frames} frames")
                 cap.release()
                 return []
             
@@ -654,48 +1648,129 @@ class ModelManagerPipeline:
                 step = total_frames // max_frames
                 frame_indices = [i * step for i in range(max_frames)]
             
-            print(f"🔊 Will extract frames at indices: {frame_indices}")
+            logger.debug(f"🔊 Will extract frames at indices: {frame_indices}")
             
-            frames = []
-            for frame_idx in frame_indices:
-                # Set frame position
-                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-                
-                # Read frame
-                ret, frame = cap.read()
-                if ret:
-                    # Convert BGR to RGB
-                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    
-                    # Convert to PIL Image
-                    pil_image = Image.fromarray(frame_rgb)
-                    
-                    frames.append(pil_image)
-                    print(f"🔊 Extracted frame {frame_idx + 1}/{total_frames}")
-                else:
-                    print(f"⚠️  Failed to read frame {frame_idx}")
+            # Downscale to the processor's input size straight away so the full
+            # resolution frame never goes through PIL or the image processor
+            frame_size = self._video_frame_size()
             
-            # Release video capture
-            cap.release()
-            
-            print(f"🔊 Successfully extracted {len(frames)} frames")
+            if len(frame_indices) > 1 and frame_indices[1] - frame_indices[0] >= SEEK_MIN_GAP:
+                # Far-apart frames: one keyframe seek each is cheaper than decoding
+                # everything in between, and separate captures can seek in parallel
+                cap.release()
+                frames = self._read_frames_parallel(video_path, frame_indices, total_frames, frame_size)
+            else:
+                raw_frames = self._read_frames_sequential(cap, frame_indices, total_frames)
+                cap.release()
+                
+                # Color conversion releases the GIL, so convert the frames in parallel
+                # while decoding stays sequential on the single capture
+                frames = []
+                if raw_frames:
+                    with ThreadPoolExecutor(max_workers=min(8, len(raw_frames))) as executor:
+                        frames = list(executor.map(lambda frame: self._frame_to_pil(frame, frame_size), raw_frames))
+            
+            logger.info(f"🔊 Successfully extracted {len(frames)} frames")
             return frames
             
         except ImportError:
-            print("❌ OpenCV not available. Install with: pip install opencv-python")
+            logger.error("❌ OpenCV not available. Install with: pip install opencv-python")
             return []
         except Exception as e:
-            import traceback
-            print(f"❌ Error extracting video frames: {e}")
-            print(f"❌ Full traceback: {traceback.format_exc()}")
+            logger.exception("❌ Error extracting video frames: %s", e)
             return []
     
-    def chat_audio(self, messages: List[Dict]) -> Dict:
+    @staticmethod
+    def _open_video(video_path: str):
+        """Open a VideoCapture, asking for hardware decoding (e.g. NVDEC) when OpenCV supports it"""
+        # grab() still decodes every frame it skips, so the decoder is the hot loop
+        hw_acceleration = getattr(cv2, "CAP_PROP_HW_ACCELERATION", None)
+        if hw_acceleration is not None:
+            cap = cv2.VideoCapture(video_path, cv2.CAP_ANY, [hw_acceleration, cv2.VIDEO_ACCELERATION_ANY])
+            if cap.isOpened():
+                return cap
+        return cv2.VideoCapture(video_path)
+    
+    def _read_frames_sequential(self, cap, frame_indices: List[int], total_frames: int) -> List:
+        """Decode the stream once up to the last index, keeping the raw BGR frames at frame_indices"""
+        raw_frames = []
+        target_indices = set(frame_indices)
+        first_idx = 0
+        if len(frame_indices) == 1:
+            # A single frame only needs one seek
+            first_idx = frame_indices[0]
+            cap.set(cv2.CAP_PROP_POS_FRAMES, first_idx)
+        
+        # Walk the stream once instead of seeking per frame (each seek
+        # re-decodes from the previous keyframe); grab() advances the
+        # decoder and retrieve() only converts the sampled frames
+        for frame_idx in range(first_idx, frame_indices[-1] + 1):
+            if not cap.grab():
+                logger.warning(f"⚠️  Failed to read frame {frame_idx}")
+                break
+            if frame_idx not in target_indices:
+                continue
+            
+            ret, frame = cap.retrieve()
+            if ret:
+                raw_frames.append(frame)
+                logger.debug(f"🔊 Extracted frame {frame_idx + 1}/{total_frames}")
+            else:
+                logger.warning(f"⚠️  Failed to read frame {frame_idx}")
+        return raw_frames
+    
+    def _read_frames_parallel(self, video_path: str, frame_indices: List[int],
+                              total_frames: int, frame_size=None) -> List[Image.Image]:
+        """Seek to each index on its own VideoCapture (captures aren't thread-safe) in a thread pool"""
+        def read_frame(frame_idx):
+            cap = self._open_video(video_path)
+            try:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+                ret, frame = cap.read()
+            finally:
+                cap.release()
+            if not ret:
+                logger.warning(f"⚠️  Failed to read frame {frame_idx}")
+                return None
+            logger.debug(f"🔊 Extracted frame {frame_idx + 1}/{total_frames}")
+            return self._frame_to_pil(frame, frame_size)
+        
+        # Decoding and conversion run in OpenCV/NumPy C code with the GIL released
+        with ThreadPoolExecutor(max_workers=min(8, len(frame_indices))) as executor:
+            frames = list(executor.map(read_frame, frame_indices))
+        return [frame for frame in frames if frame is not None]
+    
+    def _video_frame_size(self):
+        """(width, height) the image processor resizes images to, or None if it has no fixed size"""
+        image_processor = getattr(self.direct_processor, "image_processor", None)
+        size = getattr(image_processor, "size", None)
+        if size is None:
+            return None
+        if isinstance(size, dict):
+            width, height = size.get("width"), size.get("height")
+        else:
+            width, height = getattr(size, "width", None), getattr(size, "height", None)
+        return (width, height) if width and height else None
+    
+    @staticmethod
+    def _frame_to_pil(frame, size=None) -> Image.Image:
+        """Convert an OpenCV BGR frame to a PIL RGB image, downscaled to size (width, height) if given"""
+        if size is not None and (frame.shape[1] > size[0] or frame.shape[0] > size[1]):
+            # INTER_AREA averages source pixels, the right filter for shrinking
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        # PIL's raw "BGR" unpacker swaps channels while copying into the image,
+        # so there is no intermediate RGB array at all
+        height, width = frame.shape[:2]
+        return Image.frombuffer("RGB", (width, height), np.ascontiguousarray(frame), "raw", "BGR", 0, 1)
+    
+    def chat_audio(self, messages: List[Dict], max_chunk_seconds: float = AUDIO_CHUNK_SECONDS) -> Dict:
         """
         Send audio transcription request using direct model loading
         
         Args:
             messages: List of message dictionaries (audio path should be embedded in messages)
+            max_chunk_seconds: Longer audio is transcribed window by window and the
+                transcripts joined, which caps the audio encoder's peak memory
         
         Returns:
             Dictionary with response and metadata
@@ -708,61 +1783,46 @@ class ModelManagerPipeline:
             if not self.direct_model or not self.direct_processor:
                 raise Exception("Direct model not loaded")
             
-            print(f"🔊 Using direct model for audio transcription")
-            print(f"🔊 Audio chat request:")
-            print(f"   Messages: {json.dumps(messages, indent=2)}")
-            
-            start_time = time.time()
-            
-            # Apply chat template
-            input_ids = self.direct_processor.apply_chat_template(
-                messages,
-                add_generation_prompt=True,
-                tokenize=True,
-                return_dict=True,
-                return_tensors="pt"
-            )
-            
-            # Move to the same device as the model
-            model_dtype = next(self.direct_model.parameters()).dtype
-            input_ids = input_ids.to(self.device, dtype=model_dtype)
-            print(f"🔊 Using model dtype: {model_dtype} on device: {self.device}")
-            
-            # Generate response
-            outputs = self.direct_model.generate(
-                **input_ids, 
-                max_new_tokens=512,  # Longer for audio transcription
-                do_sample=True,
-                temperature=0.7
-            )
-            
-            # Decode response
-            decoded_outputs = self.direct_processor.batch_decode(
-                outputs,
-                skip_special_tokens=False,
-                clean_up_tokenization_spaces=False
-            )
-            
-            if isinstance(decoded_outputs, list) and len(decoded_outputs) > 0:
-                response_text = decoded_outputs[0]
-            else:
-                response_text = str(decoded_outputs)
-            
-            # Extract just the model's response (after <start_of_turn>model)
-            if '<start_of_turn>model' in response_text:
-                model_response = response_text.split('<start_of_turn>model')[-1]
-                if '<end_of_turn>' in model_response:
-                    model_response = model_response.split('<end_of_turn>')[0]
-                # Clean up any remaining special tokens
-                model_response = model_response.replace('<bos>', '').replace('<eos>', '').strip()
-            else:
-                model_response = response_text
+            logger.info("🔊 Using direct model for audio transcription")
+            logger.info("🔊 Audio chat request:")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("   Messages: %s", self._summarize_messages(messages))
+            
+            start_time = time.perf_counter()
+            
+            with torch.inference_mode():
+                transcripts = []
+                for chunk_messages in self._split_audio_messages(messages, max_chunk_seconds):
+                    # Apply chat template
+                    input_ids = self.direct_processor.apply_chat_template(
+                        chunk_messages,
+                        add_generation_prompt=True,
+                        tokenize=True,
+                        return_dict=True,
+                        return_tensors="pt"
+                    )
+                    
+                    # Move to the same device as the model (token ids stay int64)
+                    input_ids = self._move_inputs(input_ids)
+                    logger.debug(f"🔊 Using device: {self.device}")
+                    
+                    # Generate response
+                    # Long clips can run out of memory on a fragmented allocator; retry once after freeing
+                    outputs = self._run_with_oom_retry(
+                        lambda: self._generate(input_ids, max_new_tokens=512)  # Longer for audio transcription
+                    )
+                    
+                    # Decode only the generated tokens (prompt tokens are sliced off)
+                    transcripts.append(self._decode_response(outputs, input_ids['input_ids'].shape[1]))
+                    del outputs, input_ids
+                
+                model_response = " ".join(transcript.strip() for transcript in transcripts)
             
-            end_time = time.time()
+            end_time = time.perf_counter()
             inference_time = end_time - start_time
             
-            print(f"🔊 Audio response: {model_response}")
-            print(f"⏱️  Audio transcription time: {inference_time:.2f} seconds")
+            logger.debug("🔊 Audio response: %s", model_response)
+            logger.info("⏱️  Audio transcription time: %.2f seconds", inference_time)
             
             return {
                 'success': True,
@@ -773,52 +1833,192 @@ class ModelManagerPipeline:
             }
             
         except Exception as e:
-            import traceback
-            print(f"🔊 Audio transcription error: {e}")
-            print(f"🔊 Full traceback: {traceback.format_exc()}")
-            return {
-                'success': False,
-                'error': str(e),
-                'mode': 'audio-direct'
-            }
+            # The traceback is only formatted if a handler actually emits the record
+            logger.exception("🔊 Audio transcription error: %s", e)
+            error = str(e)
+        
+        # A failed forward leaves its partial activations in the caching allocator; freed
+        # here because inside the except block the traceback still holds them
+        self._release_cuda_memory()
+        return {
+            'success': False,
+            'error': error,
+            'mode': 'audio-direct'
+        }
+    
+    def _split_audio_messages(self, messages: List[Dict], max_chunk_seconds: float) -> List[List[Dict]]:
+        """
+        Split a request whose audio runs longer than max_chunk_seconds into one request per window
+        
+        Args:
+            messages: Chat messages with one audio item (path or URL)
+            max_chunk_seconds: Window length in seconds
+        
+        Returns:
+            List of message lists, each carrying one window as a waveform (a single list
+            for short audio, so the processor doesn't decode the file again); [messages]
+            when there is no audio path or it can't be decoded here
+        """
+        if not AUDIO_LOADING_AVAILABLE or not max_chunk_seconds:
+            return [messages]
+        
+        audio_item = next(
+            (item for message in messages if isinstance(message.get("content"), list)
+             for item in message["content"]
+             if isinstance(item, dict) and item.get("type") == "audio" and isinstance(item.get("audio"), str)),
+            None
+        )
+        if audio_item is None:
+            return [messages]
+        
+        sampling_rate = self.direct_processor.feature_extractor.sampling_rate
+        try:
+            audio = load_audio(audio_item["audio"], sampling_rate=sampling_rate)
+        except Exception as e:
+            logger.warning(f"⚠️  Could not decode audio for chunking, sending it whole: {e}")
+            return [messages]
+        
+        window = int(max_chunk_seconds * sampling_rate)
+        if len(audio) > window:
+            # Windows don't overlap: the transcripts are joined as text, so overlapping
+            # audio would repeat the words spoken in the overlap
+            logger.info(f"🔊 Splitting {len(audio) / sampling_rate:.1f}s of audio into {max_chunk_seconds:g}s windows")
+        chunked = []
+        for start in range(0, len(audio), window):
+            chunk_item = {**audio_item, "audio": audio[start:start + window]}
+            chunked.append([
+                {**message, "content": [chunk_item if item is audio_item else item for item in message["content"]]}
+                if isinstance(message.get("content"), list) else message
+                for message in messages
+            ])
+        return chunked
+    
+    def _run_with_oom_retry(self, fn):
+        """Call fn(), retrying once after freeing cached CUDA memory if it runs out of memory"""
+        try:
+            return fn()
+        except torch.cuda.OutOfMemoryError:
+            pass
+        # Retried outside the except block so the failed attempt's frames, and the
+        # tensors they hold, are already released when the cache is emptied
+        if self._vram_reservation is not None:
+            # The block goes back to this process's caching allocator, not the driver,
+            # so the retry can use it before anything else can
+            logger.warning("⚠️  CUDA out of memory, releasing the VRAM reservation and retrying once")
+            self._vram_reservation = None
+            gc.collect()
+        else:
+            logger.warning("⚠️  CUDA out of memory, freeing cached memory and retrying once")
+            self._release_cuda_memory()
+        result = fn()
+        self._reserve_vram()
+        return result
+    
+    def _reserve_vram(self):
+        """Hold reserve_vram_mb of VRAM as headroom (no-op if disabled, held already or off CUDA)"""
+        if not self.reserve_vram_mb or not self._on_cuda or self._vram_reservation is not None:
+            return
+        try:
+            self._vram_reservation = torch.empty(self.reserve_vram_mb * 1024 * 1024, dtype=torch.uint8,
+                                                 device=self._torch_device)
+        except torch.cuda.OutOfMemoryError:
+            logger.warning(f"⚠️  Could not reserve {self.reserve_vram_mb} MB of VRAM headroom")
+    
+    @staticmethod
+    def _release_cuda_memory():
+        """Drop dead tensors and hand the allocator's free blocks back to the driver"""
+        if not torch.cuda.is_available():
+            return
+        gc.collect()
+        torch.cuda.empty_cache()
+        try:
+            torch.cuda.ipc_collect()
+        except Exception:
+            pass
     
     def get_status(self) -> Dict:
         """Get current model status"""
-        status = {
-            'mode': 'direct',
-            'model_path': self.model_path,
-            'device': self.device,
-            'model_loaded': self._model_loaded,
-            'direct_model_loaded': self.direct_model is not None,
-            'direct_processor_loaded': self.direct_processor is not None
-        }
+        status = self._status_template.copy()
+        status['model_loaded'] = self._model_loaded
+        status['direct_model_loaded'] = self.direct_model is not None
+        status['direct_processor_loaded'] = self.direct_processor is not None
         
-        # Add GPU info if available
-        if torch.cuda.is_available():
-            status['gpu_name'] = torch.cuda.get_device_name(0)
-            status['gpu_memory_total'] = torch.cuda.get_device_properties(0).total_memory / 1024**3  # GB
-            status['gpu_memory_allocated'] = torch.cuda.memory_allocated(0) / 1024**3  # GB
-            status['gpu_memory_cached'] = torch.cuda.memory_reserved(0) / 1024**3  # GB
-            status['is_jetson'] = os.path.exists("/etc/nv_tegra_release")
+        # Add live GPU memory counters if available
+        if self._gpu_static:
+            allocated = torch.cuda.memory_allocated(0)
+            reserved = torch.cuda.memory_reserved(0)
+            status['gpu_memory_allocated'] = allocated * _BYTES_TO_GIB  # GB
+            status['gpu_memory_cached'] = reserved * _BYTES_TO_GIB  # GB
+            # Cached but unused: large values mean fragmentation, the usual precursor of OOMs
+            status['gpu_memory_fragmentation_gib'] = (reserved - allocated) * _BYTES_TO_GIB
+            # Free memory as the driver sees it: counts other processes and, on Jetson,
+            # CPU use of the shared RAM, which total minus reserved would miss
+            free, _ = torch.cuda.mem_get_info(0)
+            status['gpu_memory_free_gib'] = free * _BYTES_TO_GIB
         
         return status
 
-    def _is_jetson_device(self) -> bool:
-        """Robust Jetson device detection (multiple indicators)"""
+    def unload(self, to_ram: bool = True):
+        """
+        Release the model's GPU memory while the pipeline is idle
+        
+        The next chat request (or reload()) brings the model back.
+        
+        Args:
+            to_ram: Park the weights in pinned CPU memory so reloading is a host-to-device
+                copy instead of a read from disk. Quantized, offloaded, compiled and CPU
+                models can't be moved and are always dropped.
+        """
+        with self._load_lock, self._inference_lock:
+            if not self._model_loaded:
+                return
+            
+            # Cached KV state and the dummy image live on the GPU and would pin it
+            self._prefix_caches.clear()
+            self._dummy_pixel_values = None
+            self._vram_reservation = None
+            
+            # Captured CUDA graphs and accelerate hooks point at the current device placement
+            movable = (to_ram and self._on_cuda and not self.compile_model
+                       and not self.offload and not self.offload_vision
+                       and getattr(self.direct_model, "hf_quantizer", None) is None)
+            if movable:
+                self.direct_model.to("cpu")
+                for tensor in list(self.direct_model.parameters()) + list(self.direct_model.buffers()):
+                    tensor.data = tensor.data.pin_memory()
+                self._parked_on_cpu = True
+                print("💤 Model unloaded to pinned CPU memory")
+            else:
+                self.direct_model = None
+                self.direct_processor = None
+                print("💤 Model unloaded")
+            
+            self._model_loaded = False
+            self._release_cuda_memory()
+    
+    def reload(self):
+        """Bring the model back after unload() (from RAM if it was parked there, else from disk)"""
+        self._load_direct_model()
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def _is_jetson_device() -> bool:
+        """Robust Jetson device detection (multiple indicators), probed once per process"""
         try:
-            jetson_indicators = [
-                "/etc/nv_tegra_release",
-                "/proc/device-tree/model",
-                "/sys/module/tegra_fuse/parameters/tegra_chip_id"
-            ]
-            for indicator in jetson_indicators:
-                if os.path.exists(indicator):
+            # The board name ("NVIDIA Jetson Orin Nano ...") in one read; unlike checking
+            # that the file exists, this doesn't take other device-tree ARM boards for a Jetson
+            try:
+                with open("/proc/device-tree/model", "rb") as f:
+                    board = f.read(64).lower()
+                if b"jetson" in board or b"tegra" in board:
                     return True
-            # Check GPU name for Jetson/Tegra/Xavier
+            except OSError:
+                pass
+            # Check GPU name for Jetson/Tegra/Xavier/Orin (e.g. containers without /proc/device-tree)
             if torch.cuda.is_available():
                 try:
                     device_name = torch.cuda.get_device_name(0).lower()
-                    if any(x in device_name for x in ["tegra", "jetson", "xavier"]):
+                    if any(x in device_name for x in ["tegra", "jetson", "xavier", "orin"]):
                         return True
                 except Exception:
                     pass
@@ -828,11 +2028,14 @@ class ModelManagerPipeline:
 
 # Global instance
 _pipeline_manager = None
+_pipeline_manager_lock = threading.Lock()
 
 def get_pipeline_manager() -> ModelManagerPipeline:
-    """Get global pipeline manager instance"""
+    """Get global pipeline manager instance (created once even under concurrent first calls)"""
     global _pipeline_manager
     if _pipeline_manager is None:
-        _pipeline_manager = ModelManagerPipeline()
+        with _pipeline_manager_lock:
+            if _pipeline_manager is None:
+                _pipeline_manager = ModelManagerPipeline()
     return _pipeline_manager 
 
@@ -4,11 +4,15 @@ Model API Server for Gemma 3n
 This server provides a REST API for the Gemma model, allowing the Flask app to use it without loading the model twice.
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from model_manager_pipeline import get_pipeline_manager
 import json
+import logging
 import time
 
+# The model manager logs per-request progress at INFO
+logging.basicConfig(level=logging.INFO)
+
 app = Flask(__name__)
 
 # Initialize model manager (this will load the model once)
@@ -47,6 +51,38 @@ def chat_text():
             'error': str(e)
         }), 500
 
+@app.route('/chat/text/stream', methods=['POST'])
+def chat_text_stream():
+    """Text-only chat endpoint that streams the response as plain text while it is generated"""
+    try:
+        data = request.json
+        messages = data.get('messages', [])
+        
+        print(f"📨 Received streaming text chat request with {len(messages)} messages")
+        
+        # Loading and input errors raise here, before the 200 headers go out
+        chunks = model_manager.chat_text_stream(messages)
+        
+        def generate():
+            try:
+                yield from chunks
+            except Exception as e:
+                # Headers are already sent, so the failure is reported in the body
+                print(f"❌ Error while streaming text chat response: {e}")
+                yield f"\n[ERROR] {e}\n"
+        
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/plain'
+        )
+        
+    except Exception as e:
+        print(f"❌ Error in streaming text chat endpoint: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/chat/image', methods=['POST'])
 def chat_image():
     """Image analysis endpoint"""